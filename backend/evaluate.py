@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Evaluate matcher accuracy, calibration and latency on a labeled query set
+
+Usage:
+    python evaluate.py labels.json [--text-weight 0.5] [--top-k 5]
+                       [--matcher match:clip_match] [--warmup 1] [--json]
+
+labels.json is a list of queries, each with an expected GLB model and
+images and/or a text prompt:
+    [
+      {"images": ["eval/q1_a.jpg", "eval/q1_b.jpg"], "expected": "Round Frame.glb"},
+      {"text": "round tortoiseshell frames", "expected": "Tortoise.glb"}
+    ]
+"""
+
+import sys
+import os
+import json
+import math
+import time
+import importlib
+
+import match
+
+CALIBRATION_BINS = 10
+
+
+def load_labels(path):
+    with open(path) as f:
+        labels = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    for i, q in enumerate(labels):
+        if not q.get("expected"):
+            raise ValueError(f"Label {i} has no expected model")
+        if not q.get("images") and not q.get("text"):
+            raise ValueError(f"Label {i} has neither images nor text")
+        # Image paths are relative to the label file
+        q["images"] = [os.path.join(base, p) for p in q.get("images", [])]
+    return labels
+
+
+def load_matcher(spec):
+    """Resolve a "module:function" matcher spec"""
+    module_name, func_name = spec.split(":", 1)
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def preload(matcher):
+    """Load CLIP and the index once for clip_match, returns (kwargs, seconds)"""
+    if matcher is not match.clip_match:
+        return {}, 0.0
+    start = time.perf_counter()
+    loaded = match.load_clip()
+    kwargs = {}
+    if loaded:
+        kwargs = {"loaded": loaded, "index": match.load_index(loaded[0])}
+    return kwargs, time.perf_counter() - start
+
+
+def ranked_models(result):
+    """Ranked model list from a matcher result, best first"""
+    if result.get("candidates"):
+        return [c["model"] for c in result["candidates"]]
+    if result.get("best_model"):
+        return [result["best_model"]]
+    return []
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+def expected_calibration_error(confidences, correct, bins=CALIBRATION_BINS):
+    """Weighted gap between mean confidence and accuracy over equal-width bins"""
+    total = len(confidences)
+    if not total:
+        return 0.0
+    ece = 0.0
+    for b in range(bins):
+        lo, hi = b / bins, (b + 1) / bins
+        members = [
+            i
+            for i, c in enumerate(confidences)
+            if lo <= c < hi or (b == bins - 1 and c == 1.0)
+        ]
+        if not members:
+            continue
+        avg_conf = sum(confidences[i] for i in members) / len(members)
+        accuracy = sum(correct[i] for i in members) / len(members)
+        ece += len(members) / total * abs(avg_conf - accuracy)
+    return ece
+
+
+def evaluate(labels, matcher=match.clip_match, warmup=1, **matcher_kwargs):
+    """Run every labeled query through the matcher and aggregate the metrics"""
+    for q in labels[:warmup]:
+        matcher(q.get("images", []), text=q.get("text"), **matcher_kwargs)
+
+    latencies = []
+    rows = []
+    start = time.perf_counter()
+    for q in labels:
+        t0 = time.perf_counter()
+        result = matcher(q.get("images", []), text=q.get("text"), **matcher_kwargs)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+
+        ranked = ranked_models(result)
+        rank = ranked.index(q["expected"]) + 1 if q["expected"] in ranked else None
+        rows.append(
+            {
+                "expected": q["expected"],
+                "predicted": result.get("best_model"),
+                "confidence": float(result.get("confidence", 0.0)),
+                "rank": rank,
+                "method": result.get("method"),
+                "latency_ms": round(latencies[-1], 2),
+            }
+        )
+    elapsed = time.perf_counter() - start
+
+    n = len(rows)
+    correct = [1 if r["rank"] == 1 else 0 for r in rows]
+    confidences = [r["confidence"] for r in rows]
+    methods = sorted({r["method"] for r in rows if r["method"]})
+
+    return {
+        "queries": n,
+        "methods": methods,
+        "top1": sum(correct) / n if n else 0.0,
+        "top5": sum(1 for r in rows if r["rank"] and r["rank"] <= 5) / n if n else 0.0,
+        "mrr": sum(1.0 / r["rank"] for r in rows if r["rank"]) / n if n else 0.0,
+        "mean_confidence": sum(confidences) / n if n else 0.0,
+        "ece": expected_calibration_error(confidences, correct),
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies) if latencies else 0.0,
+        },
+        "throughput_qps": n / elapsed if elapsed > 0 else 0.0,
+        "rows": rows,
+    }
+
+
+def format_report(report, config):
+    lat = report["latency_ms"]
+    lines = [
+        f"Config:      {json.dumps(config)}",
+        f"Methods:     {', '.join(report['methods']) or 'none'}",
+        f"Queries:     {report['queries']}",
+        f"Load:        {report.get('load_seconds', 0.0):.2f} s (not in latency)",
+        "",
+        f"Top-1:       {report['top1']:.3f}",
+        f"Top-5:       {report['top5']:.3f}",
+        f"MRR:         {report['mrr']:.3f}",
+        f"Mean conf:   {report['mean_confidence']:.3f}",
+        f"ECE:         {report['ece']:.3f}",
+        "",
+        f"Latency ms:  p50 {lat['p50']:.1f}  p90 {lat['p90']:.1f}  "
+        f"p99 {lat['p99']:.1f}  max {lat['max']:.1f}",
+        f"Throughput:  {report['throughput_qps']:.2f} queries/s",
+    ]
+    misses = [r for r in report["rows"] if r["rank"] != 1]
+    if misses:
+        lines += ["", "Misses:"]
+        for r in misses:
+            lines.append(
+                f"  {r['expected']} -> {r['predicted']} "
+                f"(rank {r['rank'] or '-'}, conf {r['confidence']:.3f})"
+            )
+    return "\n".join(lines)
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    option_values = {
+        match.get_option(o)
+        for o in ("--text-weight", "--top-k", "--matcher", "--warmup")
+    }
+    args = [a for a in args if a not in option_values]
+    if not args:
+        print(json.dumps({"error": "No label file"}))
+        return
+
+    config = {
+        "matcher": match.get_option("--matcher", "match:clip_match"),
+        "text_weight": float(match.get_option("--text-weight", match.DEFAULT_TEXT_WEIGHT)),
+        "top_k": int(match.get_option("--top-k", match.DEFAULT_TOP_K)),
+    }
+    if config["top_k"] < 5:
+        print("Warning: --top-k below 5 caps the top-5 metric", file=sys.stderr)
+
+    labels = load_labels(args[0])
+    matcher = load_matcher(config["matcher"])
+    preloaded, load_seconds = preload(matcher)
+    report = evaluate(
+        labels,
+        matcher=matcher,
+        warmup=int(match.get_option("--warmup", 1)),
+        text_weight=config["text_weight"],
+        top_k=config["top_k"],
+        **preloaded,
+    )
+    report["load_seconds"] = load_seconds
+
+    if "--json" in sys.argv:
+        print(json.dumps({"config": config, **report}))
+    else:
+        print(format_report(report, config))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,23 +15,11 @@ s3 = boto3.client(
 BUCKET = 'jigu'
 REF_DIR = 'reference_images'
 
-if not os.path.exists(REF_DIR):
-    os.makedirs(REF_DIR)
-
-print("Fetching all GLB models from Wasabi...")
-
-# Get all GLB files from bucket
-response = s3.list_objects_v2(Bucket=BUCKET)
-glb_files = []
-
-if 'Contents' in response:
-    for obj in response['Contents']:
-        key = obj['Key']
-        if key.lower().endswith('.glb'):
-            glb_files.append(key)
-
-print(f"Found {len(glb_files)} GLB models")
-print("Generating reference images for all models...")
+def safe_reference_name(glb_key):
+    """Reference image base name for a GLB key (path separators flattened)"""
+    base_name = os.path.splitext(glb_key)[0]
+    # Replace any path separators
+    return base_name.replace('/', '_').replace('\\', '_')
 
 def create_reference_image(model_name, output_path):
     """Create a simple reference image with model name and glasses icon"""
@@ -83,39 +71,60 @@ def create_reference_image(model_name, output_path):
     
     img.save(output_path)
 
-count = 0
-for glb_file in glb_files:
-    base_name = os.path.splitext(glb_file)[0]
-    # Replace any path separators
-    safe_name = base_name.replace('/', '_').replace('\\', '_')
-    img_path = os.path.join(REF_DIR, f"{safe_name}.jpg")
+def main():
+    if not os.path.exists(REF_DIR):
+        os.makedirs(REF_DIR)
+
+    print("Fetching all GLB models from Wasabi...")
+
+    # Get all GLB files from bucket
+    response = s3.list_objects_v2(Bucket=BUCKET)
+    glb_files = []
+
+    if 'Contents' in response:
+        for obj in response['Contents']:
+            key = obj['Key']
+            if key.lower().endswith('.glb'):
+                glb_files.append(key)
+
+    print(f"Found {len(glb_files)} GLB models")
+    print("Generating reference images for all models...")
+
+    count = 0
+    for glb_file in glb_files:
+        safe_name = safe_reference_name(glb_file)
+        img_path = os.path.join(REF_DIR, f"{safe_name}.jpg")
     
-    # Skip if already exists
-    if os.path.exists(img_path):
-        print(f"Skipping (exists): {safe_name}.jpg")
-        continue
+        # Skip if already exists
+        if os.path.exists(img_path):
+            print(f"Skipping (exists): {safe_name}.jpg")
+            continue
     
-    create_reference_image(glb_file, img_path)
+        create_reference_image(glb_file, img_path)
     
-    # Upload to S3
-    s3_key = f"reference_images/{safe_name}.jpg"
-    try:
-        s3.upload_file(img_path, BUCKET, s3_key)
-        count += 1
-        if count % 10 == 0:
-            print(f"Processed {count}/{len(glb_files)} models...")
-    except Exception as e:
-        print(f"Failed to upload {s3_key}: {e}")
+        # Upload to S3
+        s3_key = f"reference_images/{safe_name}.jpg"
+        try:
+            s3.upload_file(img_path, BUCKET, s3_key)
+            count += 1
+            if count % 10 == 0:
+                print(f"Processed {count}/{len(glb_files)} models...")
+        except Exception as e:
+            print(f"Failed to upload {s3_key}: {e}")
+
+    print(f"\n✓ Generated {count} new reference images")
+    print(f"✓ Total reference images: {len(os.listdir(REF_DIR))}")
+    print("\nNow building AI embeddings...")
+
+    # Build embeddings
+    import subprocess
+    result = subprocess.run(['python', 'match.py', '--build'], capture_output=True, text=True)
+    print(result.stdout)
+    if result.returncode != 0:
+        print("Error:", result.stderr)
+    else:
+        print("\n✓ AI is ready with all models!")
 
-print(f"\n✓ Generated {count} new reference images")
-print(f"✓ Total reference images: {len(os.listdir(REF_DIR))}")
-print("\nNow building AI embeddings...")
 
-# Build embeddings
-import subprocess
-result = subprocess.run(['python', 'match.py', '--build'], capture_output=True, text=True)
-print(result.stdout)
-if result.returncode != 0:
-    print("Error:", result.stderr)
-else:
-    print("\n✓ AI is ready with all models!")
+if __name__ == '__main__':
+    main()
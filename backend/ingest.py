@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Incremental ingest: make a single new GLB model searchable
+
+Usage:
+    python ingest.py --key "Model Name.glb" [--thumb reference_images/thumb.png]
+    python ingest.py --queue <sqs queue url>
+
+Set S3_ENDPOINT_URL / SQS_ENDPOINT_URL to run against a local stand-in
+(MinIO, moto_server, localstack) instead of Wasabi.
+
+Queue mode only deletes a message once every model in it was ingested.
+Failed ingests are left on the queue, so give it a redrive policy with a
+dead-letter queue to stop a model that can never be ingested from cycling.
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+from urllib.parse import unquote_plus
+
+import boto3
+from botocore.exceptions import ClientError
+
+import match
+from generate_all_references import (
+    s3 as wasabi_s3,
+    BUCKET,
+    REF_DIR,
+    create_reference_image,
+    safe_reference_name,
+)
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def get_s3():
+    """S3 client, pointed at S3_ENDPOINT_URL when set"""
+    endpoint = os.environ.get("S3_ENDPOINT_URL")
+    if endpoint:
+        return boto3.client("s3", endpoint_url=endpoint)
+    return wasabi_s3
+
+
+def find_reference(s3, bucket, safe_name):
+    """Return the S3 key of the newest reference image for this model, if any.
+
+    A thumbnail uploaded after a generated placeholder wins, whatever its extension.
+    """
+    found = []
+    for ext in IMAGE_EXTS:
+        key = f"reference_images/{safe_name}{ext}"
+        try:
+            head = s3.head_object(Bucket=bucket, Key=key)
+            found.append((head["LastModified"], key))
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in ("404", "NoSuchKey", "NotFound"):
+                raise
+    if not found:
+        return None
+    return max(found)[1]
+
+
+def render_reference(s3, bucket, glb_key, output_path):
+    """Render a view of the GLB itself, False when trimesh/pyrender/OpenGL is unavailable"""
+    try:
+        from render_references import render_glb_to_image
+    except Exception as e:
+        print(f"Rendering unavailable ({e}), using placeholder", file=sys.stderr)
+        return False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        glb_path = os.path.join(tmp, "model.glb")
+        s3.download_file(bucket, glb_key, glb_path)
+        return render_glb_to_image(glb_path, output_path)
+
+
+def ingest_model(glb_key, s3=None, bucket=BUCKET, thumb_key=None, loaded=None):
+    """Fetch, render or generate the reference view for one GLB and append it to the index"""
+    start = time.time()
+    if not glb_key.lower().endswith(".glb"):
+        return {"ok": False, "key": glb_key, "error": "Not a GLB file"}
+
+    # Without CLIP nothing can be indexed, so skip the S3 work as well
+    loaded = loaded or match.load_clip()
+    if not loaded:
+        return {"ok": False, "key": glb_key, "error": "CLIP unavailable"}
+
+    s3 = s3 or get_s3()
+    if not os.path.exists(REF_DIR):
+        os.makedirs(REF_DIR)
+
+    safe_name = safe_reference_name(glb_key)
+    ref_key = thumb_key or find_reference(s3, bucket, safe_name)
+
+    if ref_key:
+        # Store under the model's name so matches resolve back to the GLB
+        filename = safe_name + os.path.splitext(ref_key)[1].lower()
+        local_path = os.path.join(REF_DIR, filename)
+        print(f"Downloading {ref_key} to {local_path}", file=sys.stderr)
+        s3.download_file(bucket, ref_key, local_path)
+        source = "thumbnail"
+    else:
+        filename = f"{safe_name}.jpg"
+        local_path = os.path.join(REF_DIR, filename)
+        if render_reference(s3, bucket, glb_key, local_path):
+            source = "rendered"
+        else:
+            print(f"Generating reference image {local_path}", file=sys.stderr)
+            create_reference_image(glb_key, local_path)
+            source = "generated"
+        s3.upload_file(local_path, bucket, f"reference_images/{filename}")
+
+    ok = match.add_references([filename], loaded=loaded)
+
+    return {
+        "ok": ok,
+        "key": glb_key,
+        "reference": filename,
+        "source": source,
+        "seconds": round(time.time() - start, 3),
+    }
+
+
+def keys_from_message(body):
+    """Extract object keys from an S3 event notification, SNS envelope or {"key": ...}"""
+    data = json.loads(body)
+    if "Message" in data:
+        data = json.loads(data["Message"])
+    if "key" in data:
+        return [data["key"]]
+    return [
+        unquote_plus(r["s3"]["object"]["key"])
+        for r in data.get("Records", [])
+        if "s3" in r
+    ]
+
+
+def consume(queue_url, sqs=None, s3=None, wait_seconds=20, max_polls=None):
+    """Long-poll an SQS queue and ingest every GLB key it announces.
+
+    Runs forever unless max_polls limits the number of receive calls.
+    """
+    sqs = sqs or boto3.client("sqs", endpoint_url=os.environ.get("SQS_ENDPOINT_URL"))
+    s3 = s3 or get_s3()
+    loaded = match.load_clip()
+    if not loaded:
+        # Every message would fail and cycle through the queue until the DLQ
+        raise RuntimeError("CLIP unavailable, not consuming ingest events")
+
+    print(f"Consuming ingest events from {queue_url}", file=sys.stderr)
+    polls = 0
+    while max_polls is None or polls < max_polls:
+        polls += 1
+        resp = sqs.receive_message(
+            QueueUrl=queue_url,
+            MaxNumberOfMessages=10,
+            WaitTimeSeconds=wait_seconds,
+        )
+        for msg in resp.get("Messages", []):
+            handle = msg["ReceiptHandle"]
+            try:
+                keys = keys_from_message(msg["Body"])
+            except (ValueError, KeyError, TypeError) as e:
+                # A body we cannot parse fails the same way on every delivery
+                print(f"Dropping malformed message: {e}", file=sys.stderr)
+                sqs.delete_message(QueueUrl=queue_url, ReceiptHandle=handle)
+                continue
+
+            try:
+                results = [
+                    ingest_model(key, s3=s3, loaded=loaded)
+                    for key in keys
+                    if key.lower().endswith(".glb")
+                ]
+            except Exception as e:
+                # Leave the message on the queue so it is redelivered
+                print(f"Failed to process message: {e}", file=sys.stderr)
+                continue
+
+            for result in results:
+                print(json.dumps(result), flush=True)
+            if all(r["ok"] for r in results):
+                sqs.delete_message(QueueUrl=queue_url, ReceiptHandle=handle)
+            else:
+                print("Ingest failed, leaving message for redelivery", file=sys.stderr)
+
+
+def main():
+    queue_url = match.get_option("--queue")
+    if queue_url:
+        consume(queue_url)
+        return
+
+    key = match.get_option("--key")
+    if not key:
+        print(json.dumps({"ok": False, "error": "No --key or --queue given"}))
+        return
+
+    result = ingest_model(key, thumb_key=match.get_option("--thumb"))
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        import traceback
+
+        traceback.print_exc(file=sys.stderr)
+        print(json.dumps({"ok": False, "error": str(e)}))
+        sys.exit(1)
@@ -7,9 +7,24 @@ import sys
 import os
 import json
 import time
+import tempfile
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines, no index locking
+    fcntl = None
 
 REF_DIR = "reference_images"
 EMBEDDINGS_FILE = "reference_embeddings.pt"
+INDEX_LOCK_FILE = EMBEDDINGS_FILE + ".lock"
+TEXT_CACHE_FILE = "text_embeddings.pt"
+TEXT_CACHE_MAX_ENTRIES = 1000
+DEFAULT_TOP_K = 5
+DEFAULT_TEXT_WEIGHT = 0.5
+
+_text_cache = None
 
 
 def list_refs():
@@ -83,7 +98,8 @@ def build_embeddings():
             ref_feats = model.get_image_features(**ref_inputs)
             ref_feats = ref_feats / ref_feats.norm(p=2, dim=-1, keepdim=True)
 
-        torch.save({"features": ref_feats, "filenames": refs}, EMBEDDINGS_FILE)
+        with index_lock():
+            save_atomic(torch, {"features": ref_feats, "filenames": refs}, EMBEDDINGS_FILE)
 
         print(f"Saved embeddings to {EMBEDDINGS_FILE}", file=sys.stderr)
         return True
@@ -92,27 +108,206 @@ def build_embeddings():
         return False
 
 
-def clip_match(image_paths):
-    # Try to load embeddings first
-    loaded = load_clip()
+def add_references(filenames, loaded=None):
+    """Encode reference images and append them to the embedding index.
+
+    Only the given files are encoded; entries for the same model (same
+    name, any extension) are replaced and their stale image files removed,
+    so re-ingesting a model does not duplicate it. Pass an
+    already loaded CLIP tuple to avoid reloading the model per call.
+    """
+    loaded = loaded or load_clip()
     if not loaded:
-        return simple_match()
+        return False
 
     torch, model, processor, device, Image = loaded
+    ref_paths = [os.path.join(REF_DIR, f) for f in filenames]
+    print(f"Appending {len(ref_paths)} images to index...", file=sys.stderr)
 
-    ref_feats = None
-    ref_filenames = []
+    try:
+        new_imgs = [Image.open(p).convert("RGB") for p in ref_paths]
 
-    if os.path.exists(EMBEDDINGS_FILE):
-        try:
-            print(
-                f"Loading cached embeddings from {EMBEDDINGS_FILE}...", file=sys.stderr
+        with torch.no_grad():
+            new_inputs = processor(
+                images=new_imgs, return_tensors="pt", padding=True
+            ).to(device)
+            new_feats = model.get_image_features(**new_inputs)
+            new_feats = new_feats / new_feats.norm(p=2, dim=-1, keepdim=True)
+
+        # Concurrent ingests serialize on the lock so none of them drops another's
+        # update; the atomic swap keeps matchers from reading a partial index
+        with index_lock():
+            replaced = {os.path.splitext(f)[0] for f in filenames}
+            for f in list_refs():
+                # e.g. a generated X.jpg superseded by an uploaded X.png
+                if os.path.splitext(f)[0] in replaced and f not in filenames:
+                    os.remove(os.path.join(REF_DIR, f))
+
+            ref_feats, ref_filenames = load_index(torch)
+            if ref_feats is None:
+                ref_feats, ref_filenames = new_feats.cpu(), list(filenames)
+            else:
+                keep = [
+                    i
+                    for i, f in enumerate(ref_filenames)
+                    if os.path.splitext(f)[0] not in replaced
+                ]
+                ref_feats = torch.cat([ref_feats[keep].cpu(), new_feats.cpu()], dim=0)
+                ref_filenames = [ref_filenames[i] for i in keep] + list(filenames)
+
+            save_atomic(
+                torch, {"features": ref_feats, "filenames": ref_filenames}, EMBEDDINGS_FILE
             )
-            data = torch.load(EMBEDDINGS_FILE)
-            ref_feats = data["features"]
-            ref_filenames = data["filenames"]
-        except Exception as e:
-            print(f"Failed to load embeddings: {e}", file=sys.stderr)
+
+        print(
+            f"Index now has {len(ref_filenames)} references ({EMBEDDINGS_FILE})",
+            file=sys.stderr,
+        )
+        return True
+    except Exception as e:
+        print(f"Error appending embeddings: {e}", file=sys.stderr)
+        return False
+
+
+@contextmanager
+def index_lock():
+    """Exclusive lock around read-modify-write of the embedding index"""
+    if fcntl is None:
+        yield
+        return
+    with open(INDEX_LOCK_FILE, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def save_atomic(torch, obj, path):
+    """torch.save to a unique temp file, then swap it into place"""
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(
+        dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp", delete=False
+    ) as tmp:
+        tmp_file = tmp.name
+    try:
+        torch.save(obj, tmp_file)
+        os.replace(tmp_file, path)
+    except Exception:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+
+def load_index(torch):
+    """Load cached reference embeddings, returns (features, filenames) or (None, [])"""
+    if not os.path.exists(EMBEDDINGS_FILE):
+        return None, []
+    try:
+        print(f"Loading cached embeddings from {EMBEDDINGS_FILE}...", file=sys.stderr)
+        data = torch.load(EMBEDDINGS_FILE)
+        return data["features"], data["filenames"]
+    except Exception as e:
+        print(f"Failed to load embeddings: {e}", file=sys.stderr)
+        return None, []
+
+
+def encode_images(loaded, image_paths):
+    """Encode images into a single L2-normalized query vector (1, D)"""
+    torch, model, processor, device, Image = loaded
+    imgs = [Image.open(p).convert("RGB") for p in image_paths]
+
+    with torch.no_grad():
+        inputs = processor(images=imgs, return_tensors="pt", padding=True).to(device)
+        feats = model.get_image_features(**inputs)
+        feats = feats / feats.norm(p=2, dim=-1, keepdim=True)
+
+    mean_feat = feats.mean(dim=0, keepdim=True)
+    return mean_feat / mean_feat.norm(p=2, dim=-1, keepdim=True)
+
+
+def _load_text_cache(torch):
+    global _text_cache
+    if _text_cache is None:
+        _text_cache = OrderedDict()
+        if os.path.exists(TEXT_CACHE_FILE):
+            try:
+                _text_cache = OrderedDict(torch.load(TEXT_CACHE_FILE))
+            except Exception as e:
+                print(f"Failed to load text cache: {e}", file=sys.stderr)
+    return _text_cache
+
+
+def encode_text(loaded, prompt):
+    """Encode a text prompt into an L2-normalized query vector (1, D), cached per prompt"""
+    torch, model, processor, device, Image = loaded
+    key = " ".join(prompt.lower().split())
+    cache = _load_text_cache(torch)
+    if key in cache:
+        print(f"Text embedding cache hit: {key!r}", file=sys.stderr)
+        cache.move_to_end(key)
+        return cache[key].to(device)
+
+    with torch.no_grad():
+        # CLIP's text encoder only takes 77 tokens, longer prompts are cut
+        inputs = processor(
+            text=[key],
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=processor.tokenizer.model_max_length,
+        ).to(device)
+        feat = model.get_text_features(**inputs)
+        feat = feat / feat.norm(p=2, dim=-1, keepdim=True)
+
+    cache[key] = feat.cpu()
+    while len(cache) > TEXT_CACHE_MAX_ENTRIES:
+        cache.popitem(last=False)
+    try:
+        save_atomic(torch, cache, TEXT_CACHE_FILE)
+    except Exception as e:
+        print(f"Failed to save text cache: {e}", file=sys.stderr)
+    return feat
+
+
+def fuse_queries(image_feat, text_feat, text_weight=DEFAULT_TEXT_WEIGHT):
+    """Weighted fusion of image and text query vectors, either may be None"""
+    if image_feat is None:
+        return text_feat
+    if text_feat is None:
+        return image_feat
+    fused = (1.0 - text_weight) * image_feat + text_weight * text_feat.to(image_feat.device)
+    norm = fused.norm(p=2, dim=-1, keepdim=True)
+    if float(norm.min()) < 1e-6:
+        # Opposite image and text vectors cancel out, keep the image query
+        return image_feat
+    return fused / norm
+
+
+def search(torch, query_feat, ref_feats, k=DEFAULT_TOP_K):
+    """Top-k cosine search over normalized reference features"""
+    sims = (query_feat @ ref_feats.to(query_feat.device).T).squeeze(0)
+    k = max(1, min(k, sims.shape[0]))
+    scores, idxs = torch.topk(sims, k)
+    return [(int(i), float(s)) for s, i in zip(scores.tolist(), idxs.tolist())]
+
+
+def clip_match(
+    image_paths,
+    text=None,
+    text_weight=DEFAULT_TEXT_WEIGHT,
+    top_k=DEFAULT_TOP_K,
+    loaded=None,
+    index=None,
+):
+    # Long-running callers pass the loaded CLIP tuple and (features, filenames)
+    # index so they are not reloaded per query
+    loaded = loaded or load_clip()
+    if not loaded:
+        return simple_match()
+
+    torch = loaded[0]
+    ref_feats, ref_filenames = index if index is not None else load_index(torch)
 
     # If no embeddings or load failed, rebuild them (or fallback if too many)
     if ref_feats is None:
@@ -134,24 +329,19 @@ def clip_match(image_paths):
         return simple_match()
 
     try:
-        # Encode uploaded images
-        print(f"Processing {len(image_paths)} uploaded images...", file=sys.stderr)
-        up_imgs = [Image.open(p).convert("RGB") for p in image_paths]
-
-        with torch.no_grad():
-            up_inputs = processor(images=up_imgs, return_tensors="pt", padding=True).to(
-                device
-            )
-            up_feats = model.get_image_features(**up_inputs)
-            up_feats = up_feats / up_feats.norm(p=2, dim=-1, keepdim=True)
-
-        # Find best match
-        mean_feat = up_feats.mean(dim=0, keepdim=True)
-        mean_feat = mean_feat / mean_feat.norm(p=2, dim=-1, keepdim=True)
-
-        sims = (mean_feat @ ref_feats.T).squeeze(0)
-        best_idx = int(torch.argmax(sims).item())
-        best_score = float(sims[best_idx].item())
+        image_feat = None
+        text_feat = None
+        if image_paths:
+            print(f"Processing {len(image_paths)} uploaded images...", file=sys.stderr)
+            image_feat = encode_images(loaded, image_paths)
+        if text:
+            print(f"Encoding text prompt: {text!r}", file=sys.stderr)
+            text_feat = encode_text(loaded, text)
+
+        query_feat = fuse_queries(image_feat, text_feat, text_weight)
+        hits = search(torch, query_feat, ref_feats, top_k)
+
+        best_idx, best_score = hits[0]
         best_ref = ref_filenames[best_idx]
 
         base = os.path.splitext(best_ref)[0]
@@ -159,12 +349,27 @@ def clip_match(image_paths):
 
         print(f"Best match: {best_ref} with score {best_score:.3f}", file=sys.stderr)
 
+        if image_feat is not None and text_feat is not None:
+            method = "clip_hybrid"
+        elif text_feat is not None:
+            method = "clip_text"
+        else:
+            method = "clip_cached"
+
         return {
             "best_model": base + ".glb",
             "confidence": round(confidence, 3),
             "source_image": best_ref,
             "matched": True,
-            "method": "clip_cached",
+            "method": method,
+            "candidates": [
+                {
+                    "model": os.path.splitext(ref_filenames[i])[0] + ".glb",
+                    "source_image": ref_filenames[i],
+                    "confidence": round((score + 1.0) / 2.0, 3),
+                }
+                for i, score in hits
+            ],
         }
 
     except Exception as e:
@@ -175,19 +380,39 @@ def clip_match(image_paths):
         return simple_match()
 
 
+def get_option(name, default=None):
+    """Read a --name value option from argv"""
+    if name in sys.argv:
+        idx = sys.argv.index(name)
+        if idx + 1 < len(sys.argv):
+            return sys.argv[idx + 1]
+    return default
+
+
 def main():
     if "--build" in sys.argv:
         success = build_embeddings()
         print(json.dumps({"ok": success}))
         return
 
-    images = [a for a in sys.argv[1:] if not a.startswith("--")]
+    text = get_option("--text")
+    text_weight = float(get_option("--text-weight", DEFAULT_TEXT_WEIGHT))
+    top_k = int(get_option("--top-k", DEFAULT_TOP_K))
+
+    option_values = {text, get_option("--text-weight"), get_option("--top-k")}
+    images = [
+        a for a in sys.argv[1:] if not a.startswith("--") and a not in option_values
+    ]
+
+    if not images and not text:
+        print(json.dumps({"error": "No images or text", "matched": False}))
+        return
 
-    if not images:
-        print(json.dumps({"error": "No images", "matched": False}))
+    if not 0.0 <= text_weight <= 1.0:
+        print(json.dumps({"error": "--text-weight must be between 0 and 1", "matched": False}))
         return
 
-    result = clip_match(images)
+    result = clip_match(images, text=text, text_weight=text_weight, top_k=top_k)
     print(json.dumps(result))
 
 
@@ -83,6 +83,7 @@ def render_glb_to_image(glb_path, output_path, resolution=(512, 512)):
         print(f"Error rendering {glb_path}: {e}")
         return False
 
-print("This script requires: pip install trimesh pyrender")
-print("Note: pyrender requires OpenGL, which may not work in all environments")
-print("\nFor best results, use Option 2 or 3 instead (see below)")
+if __name__ == "__main__":
+    print("This script requires: pip install trimesh pyrender")
+    print("Note: pyrender requires OpenGL, which may not work in all environments")
+    print("\nFor best results, use Option 2 or 3 instead (see below)")
@@ -158,16 +158,30 @@ app.post("/upload-model", writeAuth, upload.fields([{ name: "file" }, { name: "t
     if (!file) return res.status(400).json({ error: "No GLB file uploaded (field 'file')" });
 
     const glbKey = file.originalname;
-    await s3.upload({ Bucket: BUCKET, Key: glbKey, Body: fs.createReadStream(file.path), ContentType: "model/gltf-binary" }).promise();
 
+    // Thumbnail goes first and under the model's name (as ingest.py looks it up),
+    // so the GLB upload event already finds it
+    let thumbKey = null;
     if (thumb) {
-      const thumbKey = path.posix.join("reference_images", thumb.originalname);
+      const safeName = glbKey.slice(0, glbKey.length - path.posix.extname(glbKey).length).replace(/[\/\\]/g, "_");
+      const thumbExt = path.extname(thumb.originalname).toLowerCase() || ".png";
+      thumbKey = path.posix.join("reference_images", safeName + thumbExt);
       await s3.upload({ Bucket: BUCKET, Key: thumbKey, Body: fs.createReadStream(thumb.path), ContentType: thumb.mimetype || "image/png" }).promise();
     }
 
+    await s3.upload({ Bucket: BUCKET, Key: glbKey, Body: fs.createReadStream(file.path), ContentType: "model/gltf-binary" }).promise();
+
     fs.unlinkSync(file.path);
     if (thumb) fs.unlinkSync(thumb.path);
 
+    // Make the new model searchable without a full rebuild
+    const ingestArgs = ["ingest.py", "--key", glbKey];
+    if (thumbKey) ingestArgs.push("--thumb", thumbKey);
+    const py = spawn("python3", ingestArgs, { cwd: process.cwd() });
+    py.stdout.on("data", d => console.log("Ingest:", d.toString().trim()));
+    py.stderr.on("data", d => console.error("Ingest:", d.toString().trim()));
+    py.on("error", err => console.error("Ingest failed to start:", err.message));
+
     res.json({ ok: true, name: glbKey });
   } catch (e) {
     console.error(e);
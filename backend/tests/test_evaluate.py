@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+import evaluate
+import match
+
+
+def test_percentile_nearest_rank():
+    assert evaluate.percentile([5, 1, 4, 2, 3], 50) == 3
+    assert evaluate.percentile(list(range(1, 10)), 50) == 5
+    assert evaluate.percentile(list(range(1, 101)), 90) == 90
+    assert evaluate.percentile([7], 99) == 7
+    assert evaluate.percentile([1, 2], 0) == 1
+    assert evaluate.percentile([], 50) == 0.0
+
+
+def test_expected_calibration_error():
+    assert evaluate.expected_calibration_error([], []) == 0.0
+    assert evaluate.expected_calibration_error([1.0, 1.0], [1, 1]) == 0.0
+    # Two bins: 0.9 conf at 50% accuracy, 0.2 conf at 0% accuracy
+    ece = evaluate.expected_calibration_error([0.9, 0.9, 0.2, 0.2], [1, 0, 0, 0])
+    assert ece == pytest.approx(0.5 * 0.4 + 0.5 * 0.2)
+
+
+def test_ranked_models():
+    result = {
+        "best_model": "a.glb",
+        "candidates": [{"model": "a.glb"}, {"model": "b.glb"}],
+    }
+    assert evaluate.ranked_models(result) == ["a.glb", "b.glb"]
+    assert evaluate.ranked_models({"best_model": "c.glb"}) == ["c.glb"]
+    assert evaluate.ranked_models({"error": "No images"}) == []
+
+
+def test_evaluate_with_stub_matcher():
+    ranking = ["a.glb", "b.glb", "c.glb", "d.glb", "e.glb", "f.glb"]
+
+    def matcher(image_paths, text=None, **kwargs):
+        return {
+            "best_model": ranking[0],
+            "confidence": 0.8,
+            "method": "stub",
+            "candidates": [{"model": m} for m in ranking],
+        }
+
+    labels = [
+        {"images": ["q1.jpg"], "expected": "a.glb"},
+        {"text": "round", "expected": "b.glb"},
+        {"text": "square", "expected": "f.glb"},
+        {"text": "oval", "expected": "z.glb"},
+    ]
+    report = evaluate.evaluate(labels, matcher=matcher, warmup=0)
+
+    assert report["queries"] == 4
+    assert report["methods"] == ["stub"]
+    assert report["top1"] == 0.25
+    assert report["top5"] == 0.5
+    assert report["mrr"] == pytest.approx((1 + 1 / 2 + 1 / 6) / 4)
+    assert [r["rank"] for r in report["rows"]] == [1, 2, 6, None]
+
+
+@pytest.mark.parametrize(
+    "entry",
+    [
+        {"expected": "a.glb"},
+        {"images": [], "text": "", "expected": "a.glb"},
+        {"text": "round"},
+    ],
+)
+def test_load_labels_rejects_incomplete_entries(tmp_path, entry):
+    path = tmp_path / "labels.json"
+    path.write_text(json.dumps([entry]))
+    with pytest.raises(ValueError):
+        evaluate.load_labels(str(path))
+
+
+def test_load_labels_resolves_images(tmp_path):
+    path = tmp_path / "labels.json"
+    path.write_text(json.dumps([{"images": ["q.jpg"], "expected": "a.glb"}]))
+    labels = evaluate.load_labels(str(path))
+    assert labels[0]["images"] == [str(tmp_path / "q.jpg")]
+
+
+def test_preload_only_for_clip_match(monkeypatch):
+    monkeypatch.setattr(match, "load_clip", lambda: pytest.fail("should not load"))
+    assert evaluate.preload(lambda *a, **k: {}) == ({}, 0.0)
+
+
+def test_preload_loads_clip_and_index_once(monkeypatch):
+    loaded = ("torch", "model", "processor", "cpu", "Image")
+    monkeypatch.setattr(match, "load_clip", lambda: loaded)
+    monkeypatch.setattr(match, "load_index", lambda torch: ("feats", ["a.jpg"]))
+
+    kwargs, seconds = evaluate.preload(match.clip_match)
+
+    assert kwargs == {"loaded": loaded, "index": ("feats", ["a.jpg"])}
+    assert seconds >= 0.0
+
+
+def test_clip_match_uses_preloaded_clip_and_index(monkeypatch):
+    torch = pytest.importorskip("torch")
+    monkeypatch.setattr(match, "load_clip", lambda: pytest.fail("reloaded CLIP"))
+    monkeypatch.setattr(match, "load_index", lambda t: pytest.fail("reloaded index"))
+    monkeypatch.setattr(match, "encode_text", lambda l, p: torch.tensor([[0.0, 1.0]]))
+
+    result = match.clip_match(
+        [],
+        text="round",
+        loaded=(torch, None, None, "cpu", None),
+        index=(torch.tensor([[1.0, 0.0], [0.0, 1.0]]), ["a.jpg", "b.jpg"]),
+    )
+    assert result["best_model"] == "b.glb"
@@ -0,0 +1,198 @@
+import datetime
+import json
+import os
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+from PIL import Image
+
+import ingest
+import match
+
+BUCKET = ingest.BUCKET
+CLIP_STUB = ("torch", "model", "processor", "cpu", "Image")
+
+
+@pytest.fixture
+def aws(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        sqs = boto3.client("sqs", region_name="us-east-1")
+        s3.create_bucket(Bucket=BUCKET)
+        queue_url = sqs.create_queue(
+            QueueName="ingest", Attributes={"VisibilityTimeout": "0"}
+        )["QueueUrl"]
+        yield s3, sqs, queue_url
+
+
+@pytest.fixture
+def added(monkeypatch):
+    calls = []
+
+    def add_references(filenames, loaded=None):
+        calls.append((filenames, loaded))
+        return True
+
+    monkeypatch.setattr(match, "load_clip", lambda: CLIP_STUB)
+    monkeypatch.setattr(match, "add_references", add_references)
+    monkeypatch.setattr(ingest, "render_reference", lambda *args: False)
+    return calls
+
+
+def s3_event(key):
+    return json.dumps({"Records": [{"s3": {"object": {"key": key}}}]})
+
+
+def put_png(s3, key, tmp_path):
+    path = tmp_path / "thumb.png"
+    Image.new("RGB", (8, 8), color=(10, 20, 30)).save(path)
+    s3.upload_file(str(path), BUCKET, key)
+
+
+def queued(sqs, queue_url):
+    return sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10).get(
+        "Messages", []
+    )
+
+
+def test_keys_from_message():
+    assert ingest.keys_from_message(s3_event("Round+Frame%281%29.glb")) == [
+        "Round Frame(1).glb"
+    ]
+    sns = json.dumps({"Message": s3_event("folder/Cat+Eye.glb")})
+    assert ingest.keys_from_message(sns) == ["folder/Cat Eye.glb"]
+    assert ingest.keys_from_message(json.dumps({"key": "a b.glb"})) == ["a b.glb"]
+    assert ingest.keys_from_message(json.dumps({"Event": "s3:TestEvent"})) == []
+
+
+def test_consume_ingests_s3_and_sns_events(aws, added, tmp_path):
+    s3, sqs, queue_url = aws
+    s3.put_object(Bucket=BUCKET, Key="Round Frame.glb", Body=b"glb")
+    s3.put_object(Bucket=BUCKET, Key="folder/Cat Eye.glb", Body=b"glb")
+    put_png(s3, "reference_images/Round Frame.png", tmp_path)
+
+    sqs.send_message(QueueUrl=queue_url, MessageBody=s3_event("Round+Frame.glb"))
+    sqs.send_message(
+        QueueUrl=queue_url,
+        MessageBody=json.dumps({"Message": s3_event("folder/Cat+Eye.glb")}),
+    )
+
+    ingest.consume(queue_url, sqs=sqs, s3=s3, wait_seconds=0, max_polls=1)
+
+    assert sorted(added) == [
+        (["Round Frame.png"], CLIP_STUB),
+        (["folder_Cat Eye.jpg"], CLIP_STUB),
+    ]
+    # Uploaded thumbnail is used as is, the other model gets a generated view
+    assert os.path.exists(os.path.join(ingest.REF_DIR, "Round Frame.png"))
+    assert os.path.exists(os.path.join(ingest.REF_DIR, "folder_Cat Eye.jpg"))
+    s3.head_object(Bucket=BUCKET, Key="reference_images/folder_Cat Eye.jpg")
+    assert queued(sqs, queue_url) == []
+
+
+def test_consume_leaves_failed_ingest_on_queue(aws, added, monkeypatch):
+    s3, sqs, queue_url = aws
+    monkeypatch.setattr(match, "add_references", lambda filenames, loaded=None: False)
+    sqs.send_message(QueueUrl=queue_url, MessageBody=s3_event("Round+Frame.glb"))
+
+    ingest.consume(queue_url, sqs=sqs, s3=s3, wait_seconds=0, max_polls=1)
+
+    assert len(queued(sqs, queue_url)) == 1
+
+
+def test_consume_drops_malformed_message(aws, added):
+    s3, sqs, queue_url = aws
+    sqs.send_message(QueueUrl=queue_url, MessageBody="not json")
+
+    ingest.consume(queue_url, sqs=sqs, s3=s3, wait_seconds=0, max_polls=1)
+
+    assert added == []
+    assert queued(sqs, queue_url) == []
+
+
+def test_find_reference_reraises_non_404():
+    class DeniedS3:
+        def head_object(self, Bucket, Key):
+            raise ClientError({"Error": {"Code": "403"}}, "HeadObject")
+
+    with pytest.raises(ClientError):
+        ingest.find_reference(DeniedS3(), BUCKET, "Round Frame")
+
+
+def test_find_reference_prefers_newest():
+    modified = {
+        "reference_images/Round Frame.jpg": datetime.datetime(2026, 1, 1),
+        "reference_images/Round Frame.png": datetime.datetime(2026, 2, 1),
+    }
+
+    class StubS3:
+        def head_object(self, Bucket, Key):
+            if Key not in modified:
+                raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+            return {"LastModified": modified[Key]}
+
+    assert ingest.find_reference(StubS3(), BUCKET, "Round Frame") == (
+        "reference_images/Round Frame.png"
+    )
+
+
+def test_ingest_model_without_clip_skips_s3(monkeypatch):
+    class NoS3:
+        def __getattr__(self, name):
+            pytest.fail(f"unexpected S3 call {name}")
+
+    monkeypatch.setattr(match, "load_clip", lambda: None)
+    result = ingest.ingest_model("Round Frame.glb", s3=NoS3())
+
+    assert result["ok"] is False
+    assert result["error"] == "CLIP unavailable"
+
+
+def test_consume_requires_clip(monkeypatch):
+    monkeypatch.setattr(match, "load_clip", lambda: None)
+    with pytest.raises(RuntimeError):
+        ingest.consume("queue", sqs=object(), s3=object(), max_polls=1)
+
+
+def test_add_references_replaces_same_model(tmp_path, monkeypatch):
+    torch = pytest.importorskip("torch")
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(match.REF_DIR)
+
+    class FakeInputs(dict):
+        def to(self, device):
+            return self
+
+    class FakeModel:
+        def get_image_features(self, images):
+            # Feature is the image's RGB colour
+            return torch.tensor([list(img.getpixel((0, 0))) for img in images], dtype=torch.float)
+
+    def processor(images=None, **kwargs):
+        return FakeInputs(images=images)
+
+    loaded = (torch, FakeModel(), processor, "cpu", Image)
+
+    def save(name, color):
+        Image.new("RGB", (4, 4), color=color).save(os.path.join(match.REF_DIR, name))
+
+    save("a.jpg", (255, 0, 0))
+    save("b.jpg", (0, 255, 0))
+    assert match.add_references(["a.jpg", "b.jpg"], loaded=loaded)
+
+    # Uploaded thumbnail for "b" supersedes its generated placeholder
+    save("b.png", (0, 0, 255))
+    assert match.add_references(["b.png"], loaded=loaded)
+
+    feats, filenames = match.load_index(torch)
+    assert filenames == ["a.jpg", "b.png"]
+    assert torch.allclose(feats[0], torch.tensor([1.0, 0.0, 0.0]), atol=0.02)
+    assert torch.allclose(feats[1], torch.tensor([0.0, 0.0, 1.0]), atol=0.02)
+    assert match.list_refs() == ["a.jpg", "b.png"]
+    assert not any(f.endswith(".tmp") for f in os.listdir(tmp_path))
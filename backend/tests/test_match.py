@@ -0,0 +1,146 @@
+import json
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import match
+
+torch = pytest.importorskip("torch")
+
+
+class FakeInputs(dict):
+    def to(self, device):
+        return self
+
+
+class FakeProcessor:
+    tokenizer = SimpleNamespace(model_max_length=77)
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, text=None, images=None, **kwargs):
+        self.calls.append((text, kwargs))
+        return FakeInputs(text=text)
+
+
+class FakeModel:
+    def get_text_features(self, text):
+        # Distinct, unnormalized vector per prompt
+        return torch.tensor([[float(len(text[0])), 1.0]])
+
+
+@pytest.fixture
+def loaded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(match, "_text_cache", None)
+    return torch, FakeModel(), FakeProcessor(), "cpu", None
+
+
+def test_encode_text_normalizes_prompt_key(loaded):
+    processor = loaded[2]
+    first = match.encode_text(loaded, "  Round   Tortoiseshell Frames ")
+    second = match.encode_text(loaded, "round tortoiseshell frames")
+
+    assert len(processor.calls) == 1
+    assert processor.calls[0][0] == ["round tortoiseshell frames"]
+    assert processor.calls[0][1]["truncation"] is True
+    assert processor.calls[0][1]["max_length"] == 77
+    assert torch.allclose(first, second)
+    assert float(first.norm()) == pytest.approx(1.0)
+
+
+def test_text_cache_is_lru_bounded(loaded, monkeypatch):
+    monkeypatch.setattr(match, "TEXT_CACHE_MAX_ENTRIES", 2)
+    match.encode_text(loaded, "a")
+    match.encode_text(loaded, "bb")
+    match.encode_text(loaded, "a")  # hit moves "a" to the end
+    match.encode_text(loaded, "ccc")  # evicts "bb"
+
+    assert list(match._text_cache) == ["a", "ccc"]
+    assert len(loaded[2].calls) == 3
+
+    # Persisted cache reloads in a fresh process
+    monkeypatch.setattr(match, "_text_cache", None)
+    assert list(match._load_text_cache(torch)) == ["a", "ccc"]
+
+
+def test_fuse_queries():
+    image = torch.tensor([[1.0, 0.0]])
+    text = torch.tensor([[0.0, 1.0]])
+
+    assert match.fuse_queries(image, None) is image
+    assert match.fuse_queries(None, text) is text
+
+    fused = match.fuse_queries(image, text, text_weight=0.5)
+    assert torch.allclose(fused, torch.tensor([[0.7071, 0.7071]]), atol=1e-4)
+    assert torch.allclose(match.fuse_queries(image, text, 0.0), image)
+
+
+def test_fuse_queries_opposite_vectors_keep_image():
+    image = torch.tensor([[1.0, 0.0]])
+    fused = match.fuse_queries(image, -image, text_weight=0.5)
+    assert not torch.isnan(fused).any()
+    assert torch.equal(fused, image)
+
+
+def test_search_clamps_k():
+    refs = torch.tensor([[1.0, 0.0], [0.0, 1.0], [0.6, 0.8]])
+    hits = match.search(torch, torch.tensor([[0.0, 1.0]]), refs, k=10)
+
+    assert [i for i, _ in hits] == [1, 2, 0]
+    assert hits[0][1] == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize(
+    "images, text, method",
+    [
+        (["up.jpg"], None, "clip_cached"),
+        ([], "round", "clip_text"),
+        (["up.jpg"], "round", "clip_hybrid"),
+    ],
+)
+def test_clip_match_method_and_candidates(monkeypatch, images, text, method):
+    refs = torch.tensor([[1.0, 0.0], [0.0, 1.0], [0.6, 0.8]])
+    monkeypatch.setattr(match, "load_clip", lambda: (torch, None, None, "cpu", None))
+    monkeypatch.setattr(match, "load_index", lambda t: (refs, ["a.jpg", "b.png", "c.jpg"]))
+    monkeypatch.setattr(match, "encode_images", lambda l, p: torch.tensor([[0.0, 1.0]]))
+    monkeypatch.setattr(match, "encode_text", lambda l, p: torch.tensor([[0.0, 1.0]]))
+
+    result = match.clip_match(images, text=text, top_k=2)
+
+    assert result["method"] == method
+    assert result["best_model"] == "b.glb"
+    assert result["source_image"] == "b.png"
+    assert [c["model"] for c in result["candidates"]] == ["b.glb", "c.glb"]
+    assert result["candidates"][0]["confidence"] == 1.0
+
+
+def test_main_filters_option_values(monkeypatch, capsys):
+    calls = []
+
+    def clip_match(images, **kwargs):
+        calls.append((images, kwargs))
+        return {"matched": True}
+
+    monkeypatch.setattr(match, "clip_match", clip_match)
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["match.py", "a.jpg", "--text", "round", "--text-weight", "0.3",
+         "b.jpg", "--top-k", "3"],
+    )
+    match.main()
+
+    assert calls == [(["a.jpg", "b.jpg"], {"text": "round", "text_weight": 0.3, "top_k": 3})]
+    assert json.loads(capsys.readouterr().out) == {"matched": True}
+
+
+@pytest.mark.parametrize("weight", ["-0.1", "1.5"])
+def test_main_rejects_text_weight_out_of_range(monkeypatch, capsys, weight):
+    monkeypatch.setattr(match, "clip_match", lambda *a, **k: pytest.fail("should not match"))
+    monkeypatch.setattr(sys, "argv", ["match.py", "--text", "round", "--text-weight", weight])
+    match.main()
+
+    assert json.loads(capsys.readouterr().out)["matched"] is False